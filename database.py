@@ -43,13 +43,26 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     result = db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None):
+    """Get documents from collection, optionally sorted and projected server-side"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+
+    cursor = db[collection_name].find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
     if limit:
         cursor = cursor.limit(limit)
-    
+
     return list(cursor)
+
+def ensure_indexes():
+    """Create the indexes the API's sorted/searched queries rely on"""
+    if db is None:
+        return
+    try:
+        db.saved_notes.create_index([("timestamp", -1)])
+        db.saved_notes.create_index([("original_note", "text"), ("processed_note", "text")])
+    except Exception:
+        # Index creation is best-effort; queries still work without them
+        pass
@@ -1,26 +1,80 @@
+import hashlib
 import os
-from datetime import datetime
-from typing import List, Optional
-
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import re
+import sys
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from typing import List, Literal, Optional
+
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 
-from database import db, create_document, get_documents
+from database import db, create_document, get_documents, ensure_indexes
+
+
+class MongoORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that renders ObjectIds as strings."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=self._default)
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
 
-app = FastAPI(title="SmartNotes AI – Backend")
 
+# orjson serializes responses in one C pass and handles datetime natively —
+# the stdlib json encoder is noticeably slower on /api/history's payloads.
+app = FastAPI(title="SmartNotes AI – Backend", default_response_class=MongoORJSONResponse)
+
+
+@app.on_event("startup")
+def _create_indexes():
+    ensure_indexes()
+
+# Explicit origin list (comma-separated CORS_ORIGINS env var) and a 24h
+# preflight max_age so browsers stop re-sending OPTIONS for every call.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=os.getenv("CORS_ORIGINS", "http://localhost:3000").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
 
+# Known flows, validated by pydantic-core before the handler ever runs
+FlowName = Literal[
+    "summarize",
+    "rewrite",
+    "bullet_points",
+    "short_version",
+    "eli5",
+    "flashcards",
+    "mcqs",
+    "short_questions",
+    "chapter_summary",
+    "mindmap",
+    "smart_tags",
+    "study_plan",
+    "compare_notes",
+    "voice_cleanup",
+    "pdf_extract_summary",
+    "memory_recall",
+]
+
+
 class AIRequest(BaseModel):
-    flow: str
+    flow: FlowName
     user_note: Optional[str] = None
     user_syllabus: Optional[str] = None
     note1: Optional[str] = None
@@ -41,8 +95,11 @@ async def read_root():
     return {"message": "SmartNotes AI Backend Running"}
 
 
+# NOTE: endpoints that touch PyMongo (synchronous driver) or run the CPU-bound
+# rule engine are declared as plain `def` so Starlette dispatches them to its
+# threadpool instead of blocking the event loop for every concurrent request.
 @app.get("/test")
-async def test_database():
+def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -69,178 +126,401 @@ async def test_database():
     return response
 
 
-# Map flows to prompts
+# Map flows to prompts (str.format-style fields, interpolated in one pass)
 FLOW_PROMPTS = {
-    "summarize": "Summarize this note clearly and simply:\n{{user_note}}",
-    "rewrite": "Rewrite and improve this text. Make it clean, clear, and high quality:\n{{user_note}}",
-    "bullet_points": "Turn this into clean bullet points:\n{{user_note}}",
-    "short_version": "Create a short and crisp version of this:\n{{user_note}}",
-    "eli5": "Explain the following note like I am 5 years old:\n{{user_note}}",
-    "flashcards": "Create flashcards (term : definition) from this text:\n{{user_note}}",
-    "mcqs": "Create 5 MCQs with correct answers from this text:\n{{user_note}}",
-    "short_questions": "Create 5 short answer questions with answers from this text:\n{{user_note}}",
-    "chapter_summary": "Split this note into chapters/sections and summarize each one:\n{{user_note}}",
-    "mindmap": "Convert this note into a hierarchical mindmap:\n\nTopic\n\nSubtopic\n\nPoints\nText: {{user_note}}",
-    "smart_tags": "Generate 3–6 topic tags for this note:\n{{user_note}}",
-    "study_plan": "Create a 7-day and 30-day study plan for the following syllabus/topic:\n{{user_syllabus}}",
-    "compare_notes": "Compare these two notes and list similarities, differences, and key insights:\nNote 1: {{note1}}\nNote 2: {{note2}}",
-    "voice_cleanup": "Clean and format this speech transcript. Remove filler words.\nTranscript: {{voice_text}}",
-    "pdf_extract_summary": "Extract main ideas and important points from this PDF text:\n{{pdf_text}}",
-    "memory_recall": "From the saved notes, find the notes most related to: {{query}}\nSummarize the findings in simple language.",
+    "summarize": "Summarize this note clearly and simply:\n{user_note}",
+    "rewrite": "Rewrite and improve this text. Make it clean, clear, and high quality:\n{user_note}",
+    "bullet_points": "Turn this into clean bullet points:\n{user_note}",
+    "short_version": "Create a short and crisp version of this:\n{user_note}",
+    "eli5": "Explain the following note like I am 5 years old:\n{user_note}",
+    "flashcards": "Create flashcards (term : definition) from this text:\n{user_note}",
+    "mcqs": "Create 5 MCQs with correct answers from this text:\n{user_note}",
+    "short_questions": "Create 5 short answer questions with answers from this text:\n{user_note}",
+    "chapter_summary": "Split this note into chapters/sections and summarize each one:\n{user_note}",
+    "mindmap": "Convert this note into a hierarchical mindmap:\n\nTopic\n\nSubtopic\n\nPoints\nText: {user_note}",
+    "smart_tags": "Generate 3–6 topic tags for this note:\n{user_note}",
+    "study_plan": "Create a 7-day and 30-day study plan for the following syllabus/topic:\n{user_syllabus}",
+    "compare_notes": "Compare these two notes and list similarities, differences, and key insights:\nNote 1: {note1}\nNote 2: {note2}",
+    "voice_cleanup": "Clean and format this speech transcript. Remove filler words.\nTranscript: {voice_text}",
+    "pdf_extract_summary": "Extract main ideas and important points from this PDF text:\n{pdf_text}",
+    "memory_recall": "From the saved notes, find the notes most related to: {query}\nSummarize the findings in simple language.",
+}
+
+
+# One C-level scan for sentence splitting, shared by every handler that used
+# to re-run body.split('.') plus a strip/filter list-comp of its own.
+_SENT_RE = re.compile(r"[^.]+")
+
+
+@lru_cache(maxsize=256)
+def _sentences(body: str) -> tuple:
+    return tuple(s for s in (m.group(0).strip() for m in _SENT_RE.finditer(body)) if s)
+
+
+def _first_sentences(body: str, k: int) -> list:
+    # Lazily pull just the first k sentences — handlers that keep only a
+    # handful shouldn't materialize thousands of strings from a large body.
+    it = (s for s in (m.group(0).strip() for m in _SENT_RE.finditer(body)) if s)
+    return list(islice(it, k))
+
+
+def _bullets(body: str) -> str:
+    bullets = [f"- {s}" for s in _sentences(body)]
+    return "\n".join(bullets) or body
+
+
+def _crisp(body: str) -> str:
+    return (body[:220] + ("\u2026" if len(body) > 220 else "")).strip()
+
+
+def _eli5(body: str) -> str:
+    return "Imagine you are 5: " + body.replace(" therefore", " so").replace(" thus", " so")
+
+
+def _flashcards(body: str) -> str:
+    parts = _first_sentences(body, 8)
+    return "\n".join([f"Term {i+1}: {p}\nDefinition: {p}" for i, p in enumerate(parts)]) or body
+
+
+def _mcqs(body: str) -> str:
+    qs = _first_sentences(body, 5)
+    out = []
+    for i, q in enumerate(qs):
+        out.append(f"Q{i+1}. {q}?")
+        out.append("A) Option 1")
+        out.append("B) Option 2")
+        out.append("C) Option 3")
+        out.append("D) Option 4")
+        out.append("Answer: A")
+    return "\n".join(out) or body
+
+
+def _short_questions(body: str) -> str:
+    qs = _first_sentences(body, 5)
+    return "\n".join([f"Q{i+1}. {q}?\nAns: ..." for i, q in enumerate(qs)]) or body
+
+
+def _chapter_summary(body: str) -> str:
+    parts = _first_sentences(body, 6)
+    return "\n\n".join([f"Chapter {i+1}: {p}\nSummary: {p}" for i, p in enumerate(parts)]) or body
+
+
+def _mindmap(body: str) -> str:
+    return "Topic\n  \u2514\u2500 Subtopic 1\n      \u2514\u2500 Point A\n  \u2514\u2500 Subtopic 2\n      \u2514\u2500 Point B\n\n" + body[:200]
+
+
+# Words of 5+ letters, matched in one scan instead of split+strip per token
+_TAG_WORD_RE = re.compile(r"[A-Za-z]{5,}")
+
+
+def _smart_tags(body: str) -> str:
+    # naive tags: take top words, deduped in insertion order
+    words = (m.group(0).lower() for m in _TAG_WORD_RE.finditer(body))
+    unique = list(dict.fromkeys(words))[:6]
+    return ", ".join(unique) or "general, study"
+
+
+def _study_plan(body: str) -> str:
+    return ("7-Day Plan:\n- Day 1: Read basics\n- Day 2: Key terms\n- Day 3: Practice\n- Day 4: Review\n- Day 5: Quiz\n- Day 6: Revise\n- Day 7: Mock test\n\n"
+            "30-Day Plan:\n- Weeks 1-3: Deep dive and exercises\n- Week 4: Consolidation, mocks, revision")
+
+
+def _compare_notes(body: str) -> str:
+    return "Similarities: ...\nDifferences: ...\nKey insights: ..."
+
+
+# Filler words stripped from transcripts, all in one alternation pass
+_FILLER_RE = re.compile(r"\s+(?:uh|um|kinda)\s+", re.I)
+
+
+def _voice_cleanup(body: str) -> str:
+    return _FILLER_RE.sub(" ", body)
+
+
+def _pdf_summary(body: str) -> str:
+    bullets = [f"\u2022 {s}" for s in _sentences(body)]
+    return "\n".join(bullets) or body
+
+
+def _summarize(body: str) -> str:
+    return "Summary: " + (body[:400] + ("\u2026" if len(body) > 400 else ""))
+
+
+_REWRITE_RE = re.compile(r"\b(?:very|good)\b")
+_REWRITE_MAP = {"very": "extremely", "good": "excellent"}
+
+
+def _rewrite(body: str) -> str:
+    return _REWRITE_RE.sub(lambda m: _REWRITE_MAP[m.group(0)], body).strip()
+
+
+# O(1) dispatch table keyed by the flow name the caller already knows,
+# replacing the old chain of substring tests against the prompt header.
+HANDLERS: dict = {
+    "summarize": _summarize,
+    "rewrite": _rewrite,
+    "bullet_points": _bullets,
+    "short_version": _crisp,
+    "eli5": _eli5,
+    "flashcards": _flashcards,
+    "mcqs": _mcqs,
+    "short_questions": _short_questions,
+    "chapter_summary": _chapter_summary,
+    "mindmap": _mindmap,
+    "smart_tags": _smart_tags,
+    "study_plan": _study_plan,
+    "compare_notes": _compare_notes,
+    "voice_cleanup": _voice_cleanup,
+    "pdf_extract_summary": _pdf_summary,
+}
+
+# Which request field carries each flow's input text. compare_notes draws on
+# two fields and is special-cased at the call site.
+FLOW_BODY_FIELD = {
+    "summarize": "user_note",
+    "rewrite": "user_note",
+    "bullet_points": "user_note",
+    "short_version": "user_note",
+    "eli5": "user_note",
+    "flashcards": "user_note",
+    "mcqs": "user_note",
+    "short_questions": "user_note",
+    "chapter_summary": "user_note",
+    "mindmap": "user_note",
+    "smart_tags": "user_note",
+    "study_plan": "user_syllabus",
+    "compare_notes": "note1",
+    "voice_cleanup": "voice_text",
+    "pdf_extract_summary": "pdf_text",
+    "memory_recall": "query",
 }
 
+# Intern the dispatch keys once at import so per-request lookups against
+# request-supplied flow strings hit the identity-comparison fast path.
+FLOW_PROMPTS = {sys.intern(flow): tpl for flow, tpl in FLOW_PROMPTS.items()}
+HANDLERS = {sys.intern(flow): fn for flow, fn in HANDLERS.items()}
+FLOW_BODY_FIELD = {sys.intern(flow): field for flow, field in FLOW_BODY_FIELD.items()}
 
-def simple_rule_engine(prompt: str) -> str:
+
+def simple_rule_engine(flow: str, body: str) -> str:
     """
     Lightweight stand-in for an AI model using heuristic formatting so the app is fully functional
     without external API keys. For production, replace with actual LLM calls.
     """
-    # Very naive formatting: create bullets, summaries, etc.
-    lines = [l.strip() for l in prompt.splitlines() if l.strip()]
-    body = "\n".join(lines[1:]) if len(lines) > 1 else (lines[0] if lines else "")
-    header = lines[0] if lines else ""
-
-    if "bullet points" in header.lower():
-        bullets = [f"- {s.strip()}" for s in body.split('.') if s.strip()]
-        return "\n".join(bullets) or body
-    if "short and crisp" in header.lower():
-        return (body[:220] + ("…" if len(body) > 220 else "")).strip()
-    if "explain the following note like i am 5" in header.lower():
-        return "Imagine you are 5: " + body.replace(" therefore", " so").replace(" thus", " so")
-    if "flashcards" in header.lower():
-        parts = [p.strip() for p in body.split('.') if p.strip()]
-        return "\n".join([f"Term {i+1}: {p}\nDefinition: {p}" for i, p in enumerate(parts[:8])]) or body
-    if "mcqs" in header.lower():
-        qs = [p.strip() for p in body.split('.') if p.strip()][:5]
-        out = []
-        for i, q in enumerate(qs):
-            out.append(f"Q{i+1}. {q}?")
-            out.append("A) Option 1")
-            out.append("B) Option 2")
-            out.append("C) Option 3")
-            out.append("D) Option 4")
-            out.append("Answer: A")
-        return "\n".join(out) or body
-    if "short answer questions" in header.lower():
-        qs = [p.strip() for p in body.split('.') if p.strip()][:5]
-        return "\n".join([f"Q{i+1}. {q}?\nAns: ..." for i, q in enumerate(qs)]) or body
-    if "chapters/sections" in header.lower():
-        parts = [p.strip() for p in body.split('.') if p.strip()]
-        return "\n\n".join([f"Chapter {i+1}: {p}\nSummary: {p}" for i, p in enumerate(parts[:6])]) or body
-    if "mindmap" in header.lower():
-        return "Topic\n  └─ Subtopic 1\n      └─ Point A\n  └─ Subtopic 2\n      └─ Point B\n\n" + body[:200]
-    if "generate 3–6 topic tags" in header.lower():
-        # naive tags: take top words
-        words = [w.strip(',.:;!"').lower() for w in body.split() if len(w) > 4]
-        unique = []
-        for w in words:
-            if w not in unique:
-                unique.append(w)
-            if len(unique) >= 6:
-                break
-        return ", ".join(unique[:6]) or "general, study"
-    if "study plan" in header.lower():
-        return ("7-Day Plan:\n- Day 1: Read basics\n- Day 2: Key terms\n- Day 3: Practice\n- Day 4: Review\n- Day 5: Quiz\n- Day 6: Revise\n- Day 7: Mock test\n\n" \
-                "30-Day Plan:\n- Weeks 1-3: Deep dive and exercises\n- Week 4: Consolidation, mocks, revision")
-    if "compare these two notes" in header.lower():
-        return "Similarities: ...\nDifferences: ...\nKey insights: ..."
-    if "clean and format this speech transcript" in header.lower():
-        return body.replace(" uh ", " ").replace(" um ", " ").replace(" kinda ", " ")
-    if "extract main ideas" in header.lower():
-        bullets = [f"• {s.strip()}" for s in body.split('.') if s.strip()]
-        return "\n".join(bullets) or body
-    if "summarize this note" in header.lower():
-        return "Summary: " + (body[:400] + ("…" if len(body) > 400 else ""))
-    if "rewrite and improve" in header.lower():
-        return body.replace("very", "extremely").replace("good", "excellent").strip()
-
-    return body
+    return HANDLERS.get(flow, lambda b: b)(body)
+
+
+@lru_cache(maxsize=4096)
+def _engine_cached(flow: str, prompt: str) -> str:
+    """Memoized front for the pure, deterministic rule engine."""
+    return simple_rule_engine(flow, prompt)
+
+
+# Cache of recent memory-recall results. Keys embed a generation counter that
+# save_note bumps, so stale entries become unreachable as soon as notes change.
+_RECALL_CACHE: OrderedDict = OrderedDict()
+_RECALL_CACHE_MAX = 512
+_recall_generation = 0
+
+# ETag for /api/history, derived from the newest timestamp and the document
+# count. Cached in-process so unchanged polls don't even hit Mongo; save_note
+# clears it.
+_history_etag = None
+
+
+def _current_history_etag() -> str:
+    global _history_etag
+    if _history_etag is None:
+        latest = db.saved_notes.find_one({}, sort=[("timestamp", -1)], projection={"timestamp": 1})
+        count = db.saved_notes.estimated_document_count()
+        latest_ts = latest.get("timestamp") if latest else None
+        _history_etag = hashlib.md5(f"{latest_ts}:{count}".encode()).hexdigest()
+    return _history_etag
+
+
+# Per-note search cache: _id -> (lowercased full text, preview). Saves
+# re-lowercasing every note's text on each memory-recall request.
+_NOTE_CACHE: dict = {}
+
+
+def _cache_note(note: dict) -> None:
+    _id = str(note.get("_id"))
+    if _id not in _NOTE_CACHE:
+        text = (note.get("original_note", "") + " " + note.get("processed_note", "")).lower()
+        preview = (note.get("processed_note") or note.get("original_note") or "")[:80]
+        _NOTE_CACHE[_id] = (text, preview)
 
 
 @app.post("/api/ai")
-async def ai_tools(req: AIRequest):
-    if req.flow not in FLOW_PROMPTS:
-        raise HTTPException(status_code=400, detail="Unknown flow")
-
-    prompt = FLOW_PROMPTS[req.flow]
-    # Interpolate variables
-    prompt = prompt.replace("{{user_note}}", req.user_note or "") \
-                   .replace("{{user_syllabus}}", req.user_syllabus or "") \
-                   .replace("{{note1}}", req.note1 or "") \
-                   .replace("{{note2}}", req.note2 or "") \
-                   .replace("{{voice_text}}", req.voice_text or "") \
-                   .replace("{{pdf_text}}", req.pdf_text or "") \
-                   .replace("{{query}}", req.query or "")
-
-    output = simple_rule_engine(prompt)
+def ai_tools(req: AIRequest):
+    # Hand the flow's source field straight to the engine — no template
+    # interpolation round-trip just to split the body back out of the prompt.
+    # FLOW_PROMPTS stays as the prompt map for a real LLM backend.
+    if req.flow == "compare_notes":
+        body = f"Note 1: {req.note1 or ''}\nNote 2: {req.note2 or ''}"
+    else:
+        body = getattr(req, FLOW_BODY_FIELD[req.flow]) or ""
+
+    output = _engine_cached(req.flow, body)
     return {"output": output}
 
 
 @app.post("/api/save")
-async def save_note(req: SaveNoteRequest):
+def save_note(req: SaveNoteRequest):
     doc = {
         "original_note": req.original_note,
         "processed_note": req.processed_note,
         "tags": req.tags,
-        "timestamp": datetime.utcnow(),
+        "timestamp": datetime.now(timezone.utc),
     }
     try:
         _id = create_document("saved_notes", doc)
+        _cache_note({**doc, "_id": _id})
+        global _recall_generation, _history_etag
+        _recall_generation += 1
+        _history_etag = None
         return {"id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/history")
-async def history():
+def history(request: Request):
     try:
-        notes = get_documents("saved_notes", {}, limit=100)
-        # Normalize ObjectId for JSON
-        for n in notes:
-            n["id"] = str(n.get("_id"))
-            if "_id" in n:
-                del n["_id"]
-        # Sort newest first
-        notes.sort(key=lambda x: x.get("timestamp") or x.get("created_at") or datetime.utcnow(), reverse=True)
-        return {"notes": notes}
+        # Unchanged polls short-circuit with 304 before any fetch/serialize
+        etag = _current_history_etag()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+        # Sorted newest-first by the timestamp index, so no Python-side sort.
+        # ObjectIds serialize to strings in the response class, so no per-note
+        # _id rewriting here; clients read _id directly. The projection trims
+        # the note bodies server-side — the history view only shows previews.
+        notes = get_documents(
+            "saved_notes",
+            {},
+            limit=100,
+            sort=[("timestamp", -1)],
+            projection={
+                "timestamp": 1,
+                "tags": 1,
+                "original_note": {"$substr": ["$original_note", 0, 200]},
+                "processed_note": {"$substr": ["$processed_note", 0, 200]},
+            },
+        )
+        return MongoORJSONResponse({"notes": notes}, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/memory-recall")
-async def memory_recall(query: str = Form(...)):
+def memory_recall(query: str = Form(...)):
+    cache_key = f"{_recall_generation}:{query.lower().strip()}"
+    cached = _RECALL_CACHE.get(cache_key)
+    if cached is not None:
+        _RECALL_CACHE.move_to_end(cache_key)
+        summary_lines, matches = cached
+        return {"summary": "\n".join(summary_lines), "matches": matches}
     try:
-        notes = get_documents("saved_notes", {}, limit=100)
-        # very naive match by substring count
-        def score(n):
-            text = (n.get("original_note", "") + " " + n.get("processed_note", "")).lower()
-            return text.count(query.lower())
-        top = sorted(notes, key=score, reverse=True)[:5]
-        summary_lines = [f"- { (n.get('processed_note') or n.get('original_note') or '')[:80]}..." for n in top]
-        return {"summary": "\n".join(summary_lines), "matches": [str(n.get("_id")) for n in top]}
+        try:
+            # Let Mongo's text index score and return only the top 5
+            top = list(
+                db.saved_notes.find(
+                    {"$text": {"$search": query}},
+                    {
+                        "score": {"$meta": "textScore"},
+                        "original_note": {"$substr": ["$original_note", 0, 256]},
+                        "processed_note": {"$substr": ["$processed_note", 0, 256]},
+                    },
+                )
+                .sort([("score", {"$meta": "textScore"})])
+                .limit(5)
+            )
+            for n in top:
+                _cache_note(n)
+        except Exception:
+            # No text index available: score in-process instead. Count
+            # occurrences of every query term in one C-level regex pass, over
+            # text that was lowercased once when the note was cached. Only the
+            # leading 256 chars of each field are fetched — enough for scoring
+            # previews without shipping whole notes over the wire.
+            notes = get_documents(
+                "saved_notes",
+                {},
+                limit=100,
+                projection={
+                    "original_note": {"$substr": ["$original_note", 0, 256]},
+                    "processed_note": {"$substr": ["$processed_note", 0, 256]},
+                },
+            )
+            for n in notes:
+                _cache_note(n)
+            terms = [re.escape(t) for t in query.lower().split()]
+            pat = re.compile("|".join(terms)) if terms else None
+
+            def score(n):
+                text, _ = _NOTE_CACHE[str(n.get("_id"))]
+                return len(pat.findall(text)) if pat else 0
+            top = sorted(notes, key=score, reverse=True)[:5]
+        summary_lines = [f"- {_NOTE_CACHE[str(n.get('_id'))][1]}..." for n in top]
+        matches = [str(n.get("_id")) for n in top]
+        _RECALL_CACHE[cache_key] = (summary_lines, matches)
+        if len(_RECALL_CACHE) > _RECALL_CACHE_MAX:
+            _RECALL_CACHE.popitem(last=False)
+        return {"summary": "\n".join(summary_lines), "matches": matches}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Only the first 100 KB of an upload is ever returned, so never buffer or
+# decode more than that no matter how large the client's body is.
+_TEXT_LIMIT = 100_000
+_UPLOAD_CHUNK = 16_384
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.url.path.startswith("/api/upload/"):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+            return JSONResponse({"detail": "Upload too large"}, status_code=413)
+    return await call_next(request)
+
+
+async def _read_bounded(file: UploadFile, limit: int = _TEXT_LIMIT) -> str:
+    buf = bytearray()
+    while len(buf) < limit:
+        chunk = await file.read(_UPLOAD_CHUNK)
+        if not chunk:
+            break
+        buf.extend(chunk)
+    return bytes(buf[:limit]).decode("utf-8", errors="ignore")
+
+
 @app.post("/api/upload/pdf")
 async def upload_pdf(file: UploadFile = File(...)):
     # Basic text extract: read bytes and attempt utf-8 decode fallback
-    content = await file.read()
-    try:
-        text = content.decode("utf-8", errors="ignore")
-    except Exception:
-        text = ""
-    return {"text": text[:100000]}
+    text = await _read_bounded(file)
+    return {"text": text}
 
 
 @app.post("/api/upload/text")
 async def upload_text(file: UploadFile = File(...)):
-    content = await file.read()
-    text = content.decode("utf-8", errors="ignore")
-    return {"text": text[:100000]}
+    text = await _read_bounded(file)
+    return {"text": text}
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # One worker per core (CPU-bound rule engine runs in each worker's
+    # threadpool), uvloop event loop and httptools HTTP parser for the I/O path.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True,
+    )
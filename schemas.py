@@ -13,7 +13,7 @@ Model name is converted to lowercase for the collection name:
 
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Existing example schemas remain for reference
 class User(BaseModel):
@@ -39,4 +39,4 @@ class SavedNote(BaseModel):
     original_note: str = Field(..., description="Original note content")
     processed_note: str = Field(..., description="AI processed output text")
     tags: List[str] = Field(default_factory=list, description="Smart tags for the note")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp (UTC)")
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Creation timestamp (UTC)")